@@ -1,16 +1,19 @@
-import requests
+import asyncio
+import aiohttp
 import os
 import pandas as pd
-import time
-import random
 from datetime import datetime
+from airports import load_airports
 from dotenv import load_dotenv
+from fr24 import REQUEST_TIMEOUT, BackpressureController, make_api_request
 
 # Load environment variables from .env file
 load_dotenv()
 
-airports = pd.read_csv('world-airports.csv')
-airports = airports.loc[(airports.icao_code.notna())&(airports.iata_code.notna())].set_index('icao_code')
+# Only the ICAO -> IATA mapping is needed, so read just those two columns
+airports = load_airports(['icao_code', 'iata_code']).set_index('icao_code')
+airports = airports.loc[airports.index.notna() & airports.iata_code.notna()]
+airports = airports.loc[~airports.index.duplicated()]
 # Retrieve the API token from the environment variables
 API_TOKEN = os.getenv('FR24_API')
 
@@ -27,71 +30,41 @@ headers = {
     'Authorization': f'Bearer {API_TOKEN}'
 }
 
-# Throttling parameters
-MAX_RETRIES = 5
-BASE_BACKOFF_TIME = 10  # seconds
-MAX_BACKOFF_TIME = 60  # maximum backoff time in seconds
-BATCH_SIZE = 15  # Process 15 flight IDs in a single API call
+# Throttling parameters, the rest are shared with polar_rush.py in fr24.py
+BATCH_SIZE = 15  # Most flight IDs the flight-summary endpoint accepts in a single API call
+MAX_CONCURRENT_REQUESTS = 4  # upper bound for the number of batches fetched in parallel
+CACHE_FILE = 'flight_details_cache.csv'  # flight details fetched by previous runs
 
 
-def make_api_request(url, params, headers, max_retries=MAX_RETRIES):
-    """Make an API request with throttling and exponential backoff"""
-    retry_count = 0
+def load_cached_details():
+    """Load the flight details fetched by previous runs"""
+    if not os.path.exists(CACHE_FILE):
+        return []
+    # Read every column as a string, otherwise all-digit flight IDs come back as ints and never match
+    return pd.read_csv(CACHE_FILE, engine='pyarrow', dtype={
+        'id': 'string', 'callsign': 'string', 'origin': 'string',
+        'destination': 'string', 'ori_iata': 'string', 'dest_iata': 'string',
+    }).to_dict('records')
 
-    while retry_count <= max_retries:
-        try:
-            response = requests.get(url=url, params=params, headers=headers)
 
-            # If request was successful, return the response
-            if response.status_code == 200:
-                return response.json()
+def append_to_cache(details):
+    """Append freshly fetched flight details to the on-disk cache"""
+    if details:
+        pd.DataFrame(details).to_csv(CACHE_FILE, mode='a', index=False, header=not os.path.exists(CACHE_FILE))
 
-            # Handle rate limiting (429 Too Many Requests)
-            if response.status_code == 429:
-                retry_count += 1
 
-                if retry_count > max_retries:
-                    print(f"Maximum retries ({max_retries}) exceeded. Giving up.")
-                    break
+async def get_flight_details_batch(session, controller, flight_ids):
+    """Get origin and destination airports for a batch of flight IDs, returned as a list of dicts"""
+    flight_ids = list(dict.fromkeys(flight_ids))  # drop any duplicates
 
-                # Calculate backoff time with exponential backoff and jitter
-                backoff_time = min(MAX_BACKOFF_TIME, BASE_BACKOFF_TIME * (2 ** (retry_count - 1)))
-                # Add jitter to prevent synchronized retries
-                jitter = random.uniform(0, 0.1 * backoff_time)
-                backoff_time += jitter
+    # Split batches larger than the API accepts so callers don't have to
+    if len(flight_ids) > BATCH_SIZE:
+        chunk_details = await asyncio.gather(*[
+            get_flight_details_batch(session, controller, flight_ids[start_idx:start_idx + BATCH_SIZE])
+            for start_idx in range(0, len(flight_ids), BATCH_SIZE)
+        ])
+        return [details for chunk in chunk_details for details in chunk]
 
-                print(
-                    f"Rate limited (429). Retry {retry_count}/{max_retries}. Waiting for {backoff_time:.2f} seconds...")
-                time.sleep(backoff_time)
-                continue
-
-            # Handle other errors
-            print(f"API error: {response.status_code} - {response.text}")
-            response.raise_for_status()
-
-        except requests.exceptions.RequestException as e:
-            print(f"Request error: {e}")
-            retry_count += 1
-
-            if retry_count > max_retries:
-                print(f"Maximum retries ({max_retries}) exceeded. Giving up.")
-                return {"data": []}
-
-            # Use backoff for connection errors too
-            backoff_time = min(MAX_BACKOFF_TIME, BASE_BACKOFF_TIME * (2 ** (retry_count - 1)))
-            jitter = random.uniform(0, 0.1 * backoff_time)
-            backoff_time += jitter
-
-            print(f"Connection error. Retry {retry_count}/{max_retries}. Waiting for {backoff_time:.2f} seconds...")
-            time.sleep(backoff_time)
-
-    # If we got here without returning, something went wrong
-    return {"data": []}
-
-my_flights = []
-
-def get_flight_details_batch(flight_ids):
-    """Get origin and destination airports for a batch of flight IDs"""
     # Join flight IDs with commas for the API
     flight_ids_str = ",".join(flight_ids)
 
@@ -99,39 +72,75 @@ def get_flight_details_batch(flight_ids):
         'flight_ids': flight_ids_str,
     }
 
-    # Make the API request
-    result = make_api_request(
-        url=BASE_URL + '/flight-summary/light',
-        params=params,
-        headers=headers
-    )
+    # Make the API request, the controller caps how many are in flight at once
+    async with controller:
+        result = await make_api_request(
+            session,
+            controller,
+            url=BASE_URL + '/flight-summary/light',
+            params=params
+        )
+
+    # If the API rejects the batch, retry it in halves
+    if result.get('error') in (400, 413) and len(flight_ids) > 1:
+        half = len(flight_ids) // 2
+        print(f"Batch of {len(flight_ids)} flight IDs rejected. Retrying it in two halves...")
+        first_half, second_half = await asyncio.gather(
+            get_flight_details_batch(session, controller, flight_ids[:half]),
+            get_flight_details_batch(session, controller, flight_ids[half:]),
+        )
+        return first_half + second_half
 
     # Process the response
     flights_data = result.get('data', [])
+    if not flights_data:
+        return []
+
+    batch_df = pd.DataFrame(flights_data).reindex(columns=['fr24_id', 'callsign', 'orig_icao', 'dest_icao'])
+    batch_df = batch_df.drop_duplicates('fr24_id')
 
-    for flight in flights_data:
-        flight_id =flight['fr24_id']
-        if((flight.get('orig_icao')) and (flight.get('dest_icao'))):
-            # Extract details
-            try:
-                details = {
-                    'id': flight_id,
-                    'callsign': flight['callsign'],
-                    'origin': flight['orig_icao'],
-                    'ori_iata': airports.loc[flight['orig_icao'], 'iata_code'],
-                    'dest_iata': airports.loc[flight['dest_icao'], 'iata_code'],
-                    'destination': flight['dest_icao'],
-                }
-                my_flights.append(details)
-            except:
-                print(f"Flight details error: {flight}")
+    # Only keep flights with both airports known
+    has_airports = batch_df['orig_icao'].fillna('').ne('') & batch_df['dest_icao'].fillna('').ne('')
+    batch_df = batch_df.loc[has_airports]
+
+    # Look up the IATA codes for the whole batch at once, unknown ICAO codes become NaN
+    iata_by_icao = airports['iata_code']
+    details_df = pd.DataFrame({
+        'id': batch_df['fr24_id'],
+        'callsign': batch_df['callsign'],
+        'origin': batch_df['orig_icao'],
+        'ori_iata': batch_df['orig_icao'].map(iata_by_icao),
+        'dest_iata': batch_df['dest_icao'].map(iata_by_icao),
+        'destination': batch_df['dest_icao'],
+    })
+    batch_details = details_df.to_dict('records')
+
+    append_to_cache(batch_details)
+    print(f"Retrieved details for {len(batch_details)} of {len(flight_ids)} flight IDs in batch.")
+    return batch_details
+
+
+async def fetch_all_details(batches):
+    """Fetch the details of every batch concurrently over one shared keep-alive session"""
+    connector = aiohttp.TCPConnector(limit=16, limit_per_host=MAX_CONCURRENT_REQUESTS, keepalive_timeout=85)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+
+    async with aiohttp.ClientSession(headers=headers, connector=connector, timeout=timeout) as session:
+        controller = BackpressureController(MAX_CONCURRENT_REQUESTS)
+        tasks = [get_flight_details_batch(session, controller, batch) for batch in batches]
+        return await asyncio.gather(*tasks, return_exceptions=True)
 
 
 def main():
     # Load the flight summaries
     print("Loading flight summaries from arctic_flights_summaries.csv...")
     try:
-        summaries_df = pd.read_csv('arctic_flights_summaries.csv')
+        # The multithreaded Arrow reader handles the wide flight_path column much faster than the C engine
+        summaries_df = pd.read_csv(
+            'arctic_flights_summaries.csv',
+            engine='pyarrow',
+            dtype={'fr24_id': 'string', 'callsign': 'string', 'position_count': 'int32', 'flight_path': 'string'},
+        )
         print(f"Loaded {len(summaries_df)} flight summaries.")
     except Exception as e:
         print(f"Error loading CSV file: {e}")
@@ -139,27 +148,27 @@ def main():
 
     # Get unique flight IDs, removing any None/NaN values
     unique_flight_ids = summaries_df['fr24_id'].dropna().unique().tolist()
-    print(f"Found {len(unique_flight_ids)} unique flight IDs to process.")
-
-    # Process flight IDs in batches
-    total_batches = (len(unique_flight_ids) + BATCH_SIZE - 1) // BATCH_SIZE
-
-    for batch_idx in range(total_batches):
-        start_idx = batch_idx * BATCH_SIZE
-        end_idx = min((batch_idx + 1) * BATCH_SIZE, len(unique_flight_ids))
-        batch_flight_ids = unique_flight_ids[start_idx:end_idx]
 
-        print(f"Processing batch {batch_idx + 1}/{total_batches} with {len(batch_flight_ids)} flight IDs...")
-        print(f"Flight IDs in this batch: {', '.join(batch_flight_ids)}")
-
-        # Get details for all flight IDs in the batch with a single API call
-        get_flight_details_batch(batch_flight_ids)
+    # Reuse the details fetched by previous runs for the flights in these summaries and only ask the API for the rest;
+    # details of older flights stay out, they would match today's flights with the same callsign in the merge
+    wanted_ids = set(unique_flight_ids)
+    my_flights = [details for details in load_cached_details() if details['id'] in wanted_ids]
+    known_ids = {details['id'] for details in my_flights}
+    unique_flight_ids = [flight_id for flight_id in unique_flight_ids if flight_id not in known_ids]
+    print(f"Loaded {len(my_flights)} cached flight details from {CACHE_FILE}.")
+    print(f"Found {len(unique_flight_ids)} unique flight IDs to process.")
 
-        # Add a delay between batches to be kind to the API
-        if batch_idx < total_batches - 1:
-            sleep_time = random.uniform(5, 6)
-            print(f"Batch complete. Waiting {sleep_time:.2f} seconds before next batch...")
-            time.sleep(sleep_time)
+    # Process flight IDs in batches, fetched concurrently and paced by the rate limiter
+    batches = [unique_flight_ids[start_idx:start_idx + BATCH_SIZE]
+               for start_idx in range(0, len(unique_flight_ids), BATCH_SIZE)]
+    print(f"Processing {len(batches)} batches with up to {MAX_CONCURRENT_REQUESTS} concurrent requests...")
+    results = asyncio.run(fetch_all_details(batches))
+
+    for batch_flight_ids, result in zip(batches, results):
+        if isinstance(result, Exception):
+            print(f"Failed to process batch {', '.join(batch_flight_ids)}: {result}")
+        else:
+            my_flights.extend(result)
 
     # Convert flight details to DataFrame
     if my_flights:
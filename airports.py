@@ -0,0 +1,17 @@
+import os
+import pandas as pd
+
+# Narrow Parquet copy of world-airports.csv holding only the airport columns the scripts use
+AIRPORTS_CSV = 'world-airports.csv'
+AIRPORTS_FILE = 'world-airports.parquet'
+AIRPORT_DTYPES = {'icao_code': 'string', 'iata_code': 'string', 'name': 'string', 'municipality': 'string',
+                  'latitude_deg': 'float64', 'longitude_deg': 'float64'}
+
+
+def load_airports(columns):
+    """Read airport columns from the Parquet copy, rebuilding it from the CSV when it is missing or stale"""
+    if not os.path.exists(AIRPORTS_FILE) or (os.path.exists(AIRPORTS_CSV)
+                                             and os.path.getmtime(AIRPORTS_CSV) > os.path.getmtime(AIRPORTS_FILE)):
+        airports = pd.read_csv(AIRPORTS_CSV, engine='pyarrow', usecols=list(AIRPORT_DTYPES), dtype=AIRPORT_DTYPES)
+        airports.loc[airports['iata_code'].notna()].to_parquet(AIRPORTS_FILE, index=False)
+    return pd.read_parquet(AIRPORTS_FILE, columns=columns)
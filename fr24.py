@@ -0,0 +1,226 @@
+import asyncio
+import aiohttp
+import os
+import random
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from dotenv import load_dotenv
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Throttling parameters shared by every script that talks to the FR24 API
+MAX_RETRIES = 5
+BASE_BACKOFF_TIME = 10  # seconds
+MAX_BACKOFF_TIME = 60  # maximum backoff time in seconds
+INITIAL_CONCURRENCY = 2  # concurrency to start from before the controller adapts it
+TARGET_LATENCY = 2.0  # seconds; mean latency below which concurrency is increased
+AIMD_WINDOW = 20  # number of requests averaged before each increase
+AIMD_INCREASE = 0.5  # additive increase per window
+REQUEST_TIMEOUT = 30  # seconds
+# Requests per minute allowed by the FR24 API plan, shared by every script using the same key. Defaults to the
+# 10 of the entry-level Explorer plan; set FR24_REQUESTS_PER_MINUTE in .env for a larger plan
+REQUESTS_PER_MINUTE = int(os.getenv('FR24_REQUESTS_PER_MINUTE', 10))
+
+
+def parse_retry_after(value):
+    """Return the seconds a Retry-After header asks to wait, given either as seconds or as an HTTP date"""
+    if value is None:
+        return 0
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        print(f"Ignoring unparseable Retry-After header: {value!r}")
+        return 0
+    if retry_at.tzinfo is None:
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+
+
+class RateLimiter:
+    """Pace API calls from the FR24 rate-limit headers and a sliding one-minute window"""
+
+    def __init__(self, requests_per_minute=REQUESTS_PER_MINUTE):
+        # The window is preseeded with the plan limit so a cold start can't burst through the budget
+        self.requests_per_minute = requests_per_minute
+        self.sent = deque()  # monotonic send times of the requests in the last minute
+        # Quota reported by the API, unknown until the first response arrives
+        self.limit = requests_per_minute
+        self.remaining = None
+        self.reset = 0
+
+    def update(self, response):
+        """Record the quota the API reports in the response headers"""
+        limit = response.headers.get('x-ratelimit-limit-requests')
+        remaining = response.headers.get('x-ratelimit-remaining-requests')
+        if limit is not None:
+            self.limit = int(limit)
+        if remaining is not None:
+            self.remaining = int(remaining)
+        self.reset = parse_retry_after(response.headers.get('retry-after'))
+
+    def window_delay(self):
+        """Return how many seconds until the sliding window has room for another request"""
+        now = time.monotonic()
+        while self.sent and now - self.sent[0] >= 60:
+            self.sent.popleft()
+
+        if len(self.sent) < self.requests_per_minute:
+            return 0
+        return 60 - (now - self.sent[0])
+
+    async def wait(self):
+        """Block until a request may be sent, then reserve it in the window"""
+        # Pause proactively once less than 10% of the reported quota is left
+        if self.remaining is not None and self.remaining <= max(1, 0.1 * self.limit):
+            pause = self.reset or 1
+            print(f"Rate limit quota nearly used up. Pausing for {pause:.2f} seconds...")
+            await asyncio.sleep(pause)
+            self.remaining = None
+
+        delay = self.window_delay()
+        while delay > 0:
+            print(f"Request budget for this minute used up. Waiting for {delay:.2f} seconds...")
+            await asyncio.sleep(delay)
+            delay = self.window_delay()
+
+        self.sent.append(time.monotonic())
+        if self.remaining is not None:
+            self.remaining -= 1
+
+
+rate_limiter = RateLimiter()
+
+
+class BackpressureController:
+    """Adapt the number of concurrent requests with additive increase / multiplicative decrease"""
+
+    def __init__(self, max_concurrency, initial=INITIAL_CONCURRENCY,
+                 target_latency=TARGET_LATENCY, window=AIMD_WINDOW, increase=AIMD_INCREASE):
+        self.concurrency = float(min(initial, max_concurrency))
+        self.max_concurrency = max_concurrency
+        self.target_latency = target_latency
+        self.window = window
+        self.increase = increase
+        self.latencies = []
+        self.in_flight = 0
+        self.last_decrease = float('-inf')  # monotonic time of the last halving
+        # Must be created inside the running event loop
+        self.condition = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self.condition:
+            await self.condition.wait_for(lambda: self.in_flight < int(self.concurrency))
+            self.in_flight += 1
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self.condition:
+            self.in_flight -= 1
+            # Wake every waiter, the limit may have grown since they went to sleep
+            self.condition.notify_all()
+
+    def record_success(self, latency):
+        """Grow the concurrency once a full window of requests stayed under the target latency"""
+        self.latencies.append(latency)
+        if len(self.latencies) < self.window:
+            return
+
+        mean_latency = sum(self.latencies) / len(self.latencies)
+        self.latencies = []
+        if mean_latency <= self.target_latency and self.concurrency < self.max_concurrency:
+            self.concurrency = min(self.max_concurrency, self.concurrency + self.increase)
+            print(f"Mean latency {mean_latency:.2f}s. Raising concurrency to {int(self.concurrency)}")
+
+    def record_failure(self, started):
+        """Halve the concurrency after a 429, a server error or a dropped connection
+
+        Requests sent before the last halving belong to the same congestion event, so their failures
+        are ignored and a burst of simultaneous failures only halves the concurrency once.
+        """
+        if started < self.last_decrease:
+            return
+
+        self.latencies = []
+        self.last_decrease = time.monotonic()
+        if self.concurrency > 1:
+            self.concurrency = max(1.0, self.concurrency / 2)
+            print(f"Backing off. Lowering concurrency to {int(self.concurrency)}")
+
+
+async def make_api_request(session, controller, url, params, max_retries=MAX_RETRIES):
+    """Make an API request with throttling and exponential backoff"""
+    retry_count = 0
+
+    while retry_count <= max_retries:
+        await rate_limiter.wait()
+        started = time.monotonic()
+        try:
+            async with session.get(url, params=params) as response:
+                # If request was successful, return the response
+                if response.status == 200:
+                    rate_limiter.update(response)
+                    data = await response.json()
+                    controller.record_success(time.monotonic() - started)
+                    return data
+
+                # Handle rate limiting (429 Too Many Requests)
+                if response.status == 429:
+                    rate_limiter.update(response)
+                    controller.record_failure(started)
+                    retry_count += 1
+
+                    if retry_count > max_retries:
+                        print(f"Maximum retries ({max_retries}) exceeded. Giving up.")
+                        break
+
+                    # Calculate backoff time with exponential backoff and jitter
+                    backoff_time = min(MAX_BACKOFF_TIME, BASE_BACKOFF_TIME * (2 ** (retry_count - 1)))
+                    # Add jitter to prevent synchronized retries
+                    jitter = random.uniform(0, 0.1 * backoff_time)
+                    backoff_time += jitter
+                    # Never retry before the server says the quota resets
+                    backoff_time = max(backoff_time, rate_limiter.reset)
+
+                    print(
+                        f"Rate limited (429). Retry {retry_count}/{max_retries}. Waiting for {backoff_time:.2f} seconds...")
+                    await asyncio.sleep(backoff_time)
+                    continue
+
+                # The request itself was rejected, so retrying it unchanged won't help
+                if response.status in (400, 413):
+                    print(f"API error: {response.status} - {await response.text()}")
+                    return {"data": [], "error": response.status}
+
+                # Handle other errors
+                print(f"API error: {response.status} - {await response.text()}")
+                response.raise_for_status()
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"Request error: {e}")
+            # Client errors (4xx) say nothing about server load, everything else does
+            if not isinstance(e, aiohttp.ClientResponseError) or e.status >= 500:
+                controller.record_failure(started)
+            retry_count += 1
+
+            if retry_count > max_retries:
+                print(f"Maximum retries ({max_retries}) exceeded. Giving up.")
+                return {"data": []}
+
+            # Use backoff for connection errors too
+            backoff_time = min(MAX_BACKOFF_TIME, BASE_BACKOFF_TIME * (2 ** (retry_count - 1)))
+            jitter = random.uniform(0, 0.1 * backoff_time)
+            backoff_time += jitter
+
+            print(f"Connection error. Retry {retry_count}/{max_retries}. Waiting for {backoff_time:.2f} seconds...")
+            await asyncio.sleep(backoff_time)
+
+    # If we got here without returning, something went wrong
+    return {"data": []}
@@ -1,10 +1,14 @@
-import requests
+import asyncio
+import aiohttp
+import csv
 import os
+import numpy as np
 import pandas as pd
-import time
-import random
+import pyarrow as pa
+import pyarrow.parquet as pq
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
+from fr24 import REQUEST_TIMEOUT, BackpressureController, make_api_request
 
 # Load environment variables from .env file
 load_dotenv()
@@ -29,175 +33,130 @@ headers = {
 # Order: north, south, west, east
 arctic_bounds = "90.0,75.0,-180.0,180.0"
 
-# Throttling parameters
-MAX_RETRIES = 5
-BASE_BACKOFF_TIME = 10  # seconds
-MAX_BACKOFF_TIME = 60  # maximum backoff time in seconds
+# Throttling parameters, the rest are shared with add_airport.py in fr24.py
+MAX_CONCURRENT_REQUESTS = 8  # upper bound for the number of timestamps fetched in parallel
 
+# Flight positions are streamed to this CSV as they arrive
+POSITIONS_FILE = 'arctic_flights_last_24h.csv'
+POSITION_FIELDS = ['fr24_id', 'hex', 'callsign', 'lat', 'lon', 'track', 'alt', 'gspeed', 'vspeed', 'squawk',
+                   'timestamp', 'source', 'query_time', 'query_unix_timestamp']
 
-def make_api_request(url, params, headers, max_retries=MAX_RETRIES):
-    """Make an API request with throttling and exponential backoff"""
-    retry_count = 0
+# Flight paths are also written to this Parquet sidecar as a list<struct<lat: float32, lon: float32>> column
+PATHS_FILE = 'arctic_flights_paths.parquet'
 
-    while retry_count <= max_retries:
-        try:
-            response = requests.get(url=url, params=params, headers=headers)
 
-            # If request was successful, return the response
-            if response.status_code == 200:
-                return response.json()
-
-            # Handle rate limiting (429 Too Many Requests)
-            if response.status_code == 429:
-                retry_count += 1
-
-                if retry_count > max_retries:
-                    print(f"Maximum retries ({max_retries}) exceeded. Giving up.")
-                    break
-
-                # Calculate backoff time with exponential backoff and jitter
-                backoff_time = min(MAX_BACKOFF_TIME, BASE_BACKOFF_TIME * (2 ** (retry_count - 1)))
-                # Add jitter to prevent synchronized retries
-                jitter = random.uniform(0, 0.1 * backoff_time)
-                backoff_time += jitter
-
-                print(
-                    f"Rate limited (429). Retry {retry_count}/{max_retries}. Waiting for {backoff_time:.2f} seconds...")
-                time.sleep(backoff_time)
-                continue
-
-            # Handle other errors
-            response.raise_for_status()
-
-        except requests.exceptions.RequestException as e:
-            print(f"Request error: {e}")
-            retry_count += 1
-
-            if retry_count > max_retries:
-                print(f"Maximum retries ({max_retries}) exceeded. Giving up.")
-                return {"data": []}
-
-            # Use backoff for connection errors too
-            backoff_time = min(MAX_BACKOFF_TIME, BASE_BACKOFF_TIME * (2 ** (retry_count - 1)))
-            jitter = random.uniform(0, 0.1 * backoff_time)
-            backoff_time += jitter
-
-            print(f"Connection error. Retry {retry_count}/{max_retries}. Waiting for {backoff_time:.2f} seconds...")
-            time.sleep(backoff_time)
-
-    # If we got here without returning, something went wrong
-    return {"data": []}
-
-
-# Calculate the time range (now to 24 hours ago)
-end_time = datetime.now()
-start_time = end_time - timedelta(hours=24*7)
-
-# Initialize a dictionary to store flight paths
-# Key: fr24_id, Value: list of position dictionaries
-all_flight_paths = {}
-
-# Current timestamp to iterate through the 24-hour period
-current_time = start_time
-
-# Process in 15-minute increments
-while current_time <= end_time:
-    unix_timestamp = int(current_time.timestamp())
-    print(f"Fetching flights at: {current_time.strftime('%Y-%m-%d %H:%M:%S')}")
-
-    # Prepare request parameters
+async def fetch_positions(session, controller, writer, query_time):
+    """Fetch the flight positions inside the Arctic bounds at a single point in time and append them to the CSV"""
+    unix_timestamp = int(query_time.timestamp())
     params = {
         'bounds': arctic_bounds,
         'timestamp': unix_timestamp,
         'limit': 1000
     }
 
-    # Make the API request with throttling
-    result = make_api_request(
-        url=BASE_URL + '/historic/flight-positions/light',
-        params=params,
-        headers=headers
-    )
+    # The controller caps how many requests are in flight at once
+    async with controller:
+        print(f"Fetching flights at: {query_time.strftime('%Y-%m-%d %H:%M:%S')}")
+        result = await make_api_request(
+            session,
+            controller,
+            url=BASE_URL + '/historic/flight-positions/light',
+            params=params
+        )
 
-    if 'data' in result:
-        flights_data = result.get('data', [])
-    else:
-        flights_data = []
-
-    if flights_data:
-        print(f"Found {len(flights_data)} flights at this timestamp")
+    flights_data = result.get('data', [])
+    if not flights_data:
+        print(f"No flights found at {query_time.strftime('%Y-%m-%d %H:%M:%S')}")
+        return 0
 
-        # Process each flight
-        for flight in flights_data:
-            fr24_id = flight.get('fr24_id')
+    print(f"Found {len(flights_data)} flights at {query_time.strftime('%Y-%m-%d %H:%M:%S')}")
 
-            if not fr24_id:
-                continue  # Skip if no fr24_id
+    # Skip positions without an fr24_id and add a standardized timestamp for our records
+    positions = [
+        {**flight, 'query_time': query_time.strftime('%Y-%m-%d %H:%M:%S'), 'query_unix_timestamp': unix_timestamp}
+        for flight in flights_data if flight.get('fr24_id')
+    ]
+    writer.writerows(positions)
+    return len(positions)
 
-            # Copy the flight data as is
-            position_data = flight.copy()
 
-            # Add a standardized timestamp for our records
-            position_data['query_time'] = current_time.strftime('%Y-%m-%d %H:%M:%S')
-            position_data['query_unix_timestamp'] = unix_timestamp
+async def fetch_all_positions(query_times, writer):
+    """Fetch the flight positions for every query time over one shared keep-alive session"""
+    connector = aiohttp.TCPConnector(limit=16, limit_per_host=MAX_CONCURRENT_REQUESTS, keepalive_timeout=85)
+    timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
 
-            # Add to our collection
-            if fr24_id not in all_flight_paths:
-                all_flight_paths[fr24_id] = []
+    async with aiohttp.ClientSession(headers=headers, connector=connector, timeout=timeout) as session:
+        controller = BackpressureController(MAX_CONCURRENT_REQUESTS)
+        tasks = [fetch_positions(session, controller, writer, query_time) for query_time in query_times]
+        return await asyncio.gather(*tasks, return_exceptions=True)
 
-            all_flight_paths[fr24_id].append(position_data)
 
-    else:
-        print(f"No flights found at this timestamp")
+# Calculate the time range (now to 24 hours ago)
+end_time = datetime.now()
+start_time = end_time - timedelta(hours=24*7)
 
-    # Move to next 15-minute increment
+# Build the list of query times in 15-minute increments
+query_times = []
+current_time = start_time
+while current_time <= end_time:
+    query_times.append(current_time)
     current_time += timedelta(minutes=15)
 
-    # Add a small delay between requests to be gentle on the API
-    time.sleep(1)
-
-# Convert the collected flight paths to a DataFrame
-all_positions = []
-for fr24_id, positions in all_flight_paths.items():
-    all_positions.extend(positions)
+# Stream every position straight to the CSV instead of holding all of them in memory
+print(f"Fetching {len(query_times)} timestamps with up to {MAX_CONCURRENT_REQUESTS} concurrent requests...")
+with open(POSITIONS_FILE, 'w', newline='') as positions_file:
+    writer = csv.DictWriter(positions_file, fieldnames=POSITION_FIELDS, extrasaction='ignore')
+    writer.writeheader()
+    results = asyncio.run(fetch_all_positions(query_times, writer))
+
+total_positions = 0
+for query_time, position_count in zip(query_times, results):
+    if isinstance(position_count, Exception):
+        print(f"Failed to fetch flights at {query_time.strftime('%Y-%m-%d %H:%M:%S')}: {position_count}")
+    else:
+        total_positions += position_count
 
-if all_positions:
-    flights_df = pd.DataFrame(all_positions)
-    print(f"\nSuccessfully captured {len(all_flight_paths)} unique flights with complete paths")
-    print(f"Total position records: {len(all_positions)}")
+if total_positions:
+    flights_df = pd.read_csv(POSITIONS_FILE, engine='pyarrow',
+                             dtype={'fr24_id': 'string', 'callsign': 'string', 'hex': 'string', 'squawk': 'string'})
+    print(f"\nSuccessfully captured {flights_df['fr24_id'].nunique()} unique flights with complete paths")
+    print(f"Total position records: {len(flights_df)}")
     print(flights_df.head())  # Display the first few rows
+    print(f"Data saved to '{POSITIONS_FILE}'")
+
+    # Optional: Create a more organized version with one flight per row and path as a JSON list
+    # Positions arrive in completion order, so restore the chronological order of every path first
+    flights_df = flights_df.sort_values('query_unix_timestamp', kind='stable')
+    # Then keep the positions of each flight together, flights in order of first appearance
+    flights_df['flight_order'] = pd.factorize(flights_df['fr24_id'])[0]
+    flights_df = flights_df.sort_values('flight_order', kind='stable')
+    flights_df['point'] = '[' + flights_df['lat'].astype(str) + ', ' + flights_df['lon'].astype(str) + ']'
+    flights_df['timestamp'] = pd.to_datetime(flights_df['timestamp'], utc=True, format='ISO8601')
+
+    summaries_df = flights_df.groupby('fr24_id', sort=False).agg(
+        callsign=('callsign', 'first'),
+        position_count=('fr24_id', 'size'),
+        first_seen=('timestamp', 'min'),
+        last_seen=('timestamp', 'max'),
+        flight_path=('point', lambda points: '[' + ', '.join(points) + ']'),
+    ).reset_index()
 
-    # Save to CSV if needed
-    flights_df.to_csv('arctic_flights_last_24h.csv', index=False)
-    print("Data saved to 'arctic_flights_last_24h.csv'")
-
-    # Optional: Create a more organized version with one flight per row and path as a list
-    flight_summaries = []
-    for fr24_id, positions in all_flight_paths.items():
-        # Get callsign from first position
-        callsign = positions[0].get('callsign')
-
-        # Extract only lat/lon pairs for path
-        path = [(p.get('lat'), p.get('lon')) for p in positions]
-
-        # Get min and max timestamps to see time range of flight
-        timestamps = [datetime.fromisoformat(p.get('timestamp').replace('Z', '+00:00'))
-                      for p in positions if 'timestamp' in p and p.get('timestamp')]
-        min_time = min(timestamps) if timestamps else None
-        max_time = max(timestamps) if timestamps else None
-
-        flight_summaries.append({
-            'fr24_id': fr24_id,
-            'callsign': callsign,
-            'position_count': len(positions),
-            'first_seen': min_time,
-            'last_seen': max_time,
-            'flight_path': path
-        })
-
-    summaries_df = pd.DataFrame(flight_summaries)
     print("\nFlight summaries:")
     print(summaries_df.head())
     summaries_df.to_csv('arctic_flights_summaries.csv', index=False)
+
+    # The positions are already grouped per flight, so the path offsets are the running position counts
+    path_offsets = np.concatenate([[0], np.cumsum(summaries_df['position_count'].to_numpy())])
+    # float32 keeps ~1 m precision on coordinates at half the bytes of float64
+    points = pa.StructArray.from_arrays(
+        [pa.array(flights_df['lat'].to_numpy(dtype=np.float32)), pa.array(flights_df['lon'].to_numpy(dtype=np.float32))],
+        names=['lat', 'lon']
+    )
+    paths_table = pa.table({
+        'fr24_id': pa.array(summaries_df['fr24_id'], type=pa.string()),
+        'flight_path': pa.ListArray.from_arrays(pa.array(path_offsets, type=pa.int32()), points),
+    })
+    pq.write_table(paths_table, PATHS_FILE)
+    print(f"Flight paths saved to '{PATHS_FILE}'")
 else:
-    print("\nNo flight data found for the specified period and region.")
\ No newline at end of file
+    print("\nNo flight data found for the specified period and region.")
@@ -1,34 +1,75 @@
+import argparse
 import ssl
 import os
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
 import matplotlib.pyplot as plt
 import matplotlib.path as mpath
+from matplotlib.collections import LineCollection
+from matplotlib.colors import to_rgba
 import numpy as np
+import cartopy
 import cartopy.crs as ccrs
 import cartopy.feature as cfeature
+from pyproj import Transformer
 from matplotlib.font_manager import FontProperties
+from airports import AIRPORTS_CSV, AIRPORTS_FILE, load_airports
+
+parser = argparse.ArgumentParser(description='Map flights that crossed 80°N')
+parser.add_argument('--hires', action='store_true', help='save the map at 300 dpi instead of 150 dpi')
+args = parser.parse_args()
 
 # SSL workaround for environments with certificate issues
 ssl._create_default_https_context = ssl._create_unverified_context
 
-# Load the flight data
-flights_df = pd.read_csv('arctic_flights_enhanced.csv')
+# Keep the Natural Earth shapefiles in a stable cache directory so they are only downloaded once
+cartopy.config['data_dir'] = os.path.expanduser('~/.cache/cartopy')
+os.makedirs(cartopy.config['data_dir'], exist_ok=True)
+
+# Map features, loaded up front so a cold run downloads them before any plotting starts
+COASTLINE = cfeature.COASTLINE.with_scale('110m')
+BORDERS = cfeature.BORDERS.with_scale('110m')
+LAND = cfeature.LAND.with_scale('110m')
+OCEAN = cfeature.OCEAN.with_scale('110m')
+for feature in (COASTLINE, BORDERS, LAND, OCEAN):
+    feature.geometries()  # reads the shapefile into Cartopy's in-process geometry cache
+
+# Plain longitude/latitude coordinate system, shared by every artist placed in geographic coordinates
+PC = ccrs.PlateCarree()
+
+# Flight paths written by polar_rush.py as a list<struct<lat, lon>> column, next to the summaries they come from
+PATHS_FILE = 'arctic_flights_paths.parquet'
+SUMMARIES_FILE = 'arctic_flights_summaries.csv'
+
+# Load the flight data with the multithreaded Arrow CSV reader
+flights_df = pd.read_csv(
+    'arctic_flights_enhanced.csv',
+    engine='pyarrow',
+    dtype={'fr24_id': 'string', 'callsign': 'string', 'position_count': 'int32', 'flight_path': 'string'},
+)
 flights_df = flights_df.loc[flights_df.callsign.notna()]
+# Callsigns and airport codes repeat across many rows, so store them as categories
+flights_df = flights_df.astype({col: 'category' for col in ('callsign', 'ori_iata', 'dest_iata') if col in flights_df})
 
 # Load airport data
 airport_data = None
-if os.path.exists('world-airports.csv'):
+if os.path.exists(AIRPORTS_FILE) or os.path.exists(AIRPORTS_CSV):
     try:
-        airport_data = pd.read_csv('world-airports.csv')
-        print(f"Loaded {len(airport_data)} airports from world-airports.csv")
-
-        # Create lookup dictionary for IATA codes
-        iata_lookup = {}
-        for _, row in airport_data.iterrows():
-            if pd.notna(row['iata_code']) and row['iata_code']:
-                iata_lookup[row['iata_code']] = row
+        airport_data = load_airports(['iata_code', 'name', 'municipality', 'latitude_deg', 'longitude_deg'])
+        print(f"Loaded {len(airport_data)} airports from {AIRPORTS_FILE}")
+
+        # Create one lookup dictionary per column, keyed by IATA code; the last airport listed wins for duplicates
+        airports_by_iata = (airport_data.loc[airport_data['iata_code'].fillna('').ne('')]
+                            .drop_duplicates('iata_code', keep='last')
+                            .set_index('iata_code'))
+        name_by_iata = airports_by_iata['name'].dropna().to_dict()
+        municipality_by_iata = airports_by_iata['municipality'].dropna().to_dict()
+        located = airports_by_iata.dropna(subset=['latitude_deg', 'longitude_deg'])
+        lat_by_iata = located['latitude_deg'].to_dict()
+        lon_by_iata = located['longitude_deg'].to_dict()
     except Exception as e:
-        print(f"Could not load world-airports.csv: {e}")
+        print(f"Could not load airport data: {e}")
 else:
     print("Warning: world-airports.csv not found. Airport information will not be available.")
 
@@ -38,17 +79,10 @@ def format_airport_name(iata_code):
     if not iata_code or pd.isna(iata_code) or airport_data is None:
         return "Unknown"
 
-    # Try to find the airport by IATA code
-    if iata_code in iata_lookup:
-        airport = iata_lookup[iata_code]
-        municipality = airport['municipality'] if pd.notna(airport['municipality']) else ''
-
-        if municipality:
-            return f"{municipality} ({iata_code})"
-        else:
-            airport_name = airport['name'] if pd.notna(airport['name']) else ''
-            if airport_name:
-                return f"{airport_name} ({iata_code})"
+    # Prefer the municipality, then the airport name
+    label = municipality_by_iata.get(iata_code) or name_by_iata.get(iata_code)
+    if label:
+        return f"{label} ({iata_code})"
 
     # Return the code if we couldn't find/format a proper name
     return iata_code
@@ -59,43 +93,79 @@ def get_airport_coordinates(iata_code):
     if not iata_code or pd.isna(iata_code) or airport_data is None:
         return None
 
-    if iata_code in iata_lookup:
-        airport = iata_lookup[iata_code]
-        lat = airport['latitude_deg'] if pd.notna(airport['latitude_deg']) else None
-        lon = airport['longitude_deg'] if pd.notna(airport['longitude_deg']) else None
-
-        if lat is not None and lon is not None:
-            return (float(lat), float(lon))
+    if iata_code in lat_by_iata:
+        return (float(lat_by_iata[iata_code]), float(lon_by_iata[iata_code]))
 
     return None
 
 
-# Convert flight paths from string to list of (lat, lon) tuples
-def parse_path(path_str):
-    path_str = path_str.strip('[]')
-    coordinates = []
-    if not path_str:
-        return coordinates
-    pairs = path_str.split('), (')
-    for pair in pairs:
-        pair = pair.replace('(', '').replace(')', '')
-        lat, lon = pair.split(',')
-        coordinates.append((float(lat), float(lon)))
-    return coordinates
-
-
-flights_df['parsed_path'] = flights_df['flight_path'].apply(parse_path)
-
-
-# Count data points above 80° latitude for each flight
-def count_points_above_80(path):
-    return sum(1 for lat, lon in path if lat > 80)
-
-
-flights_df['points_above_80'] = flights_df['parsed_path'].apply(count_points_above_80)
+# Read the flight paths from the Parquet sidecar as {fr24_id: float32 array} lookups of latitudes and longitudes
+def load_sidecar_paths(path_file):
+    table = pq.read_table(path_file)
+    paths = table.column('flight_path').combine_chunks()
+    points = paths.flatten()
+    offsets = paths.offsets.to_numpy()
+    split_at = (offsets - offsets[0])[1:-1]
+    fr24_ids = table.column('fr24_id').to_pylist()
+    lats = np.split(points.field('lat').to_numpy(zero_copy_only=False).astype(np.float32, copy=False), split_at)
+    lons = np.split(points.field('lon').to_numpy(zero_copy_only=False).astype(np.float32, copy=False), split_at)
+    return dict(zip(fr24_ids, lats)), dict(zip(fr24_ids, lons))
+
+
+# Write parsed flight paths to the Parquet sidecar in the same layout polar_rush.py uses
+def save_sidecar_paths(path_file, fr24_ids, coordinates, offsets):
+    points = pa.StructArray.from_arrays([pa.array(coordinates[:, 0]), pa.array(coordinates[:, 1])], names=['lat', 'lon'])
+    pq.write_table(pa.table({
+        'fr24_id': pa.array(fr24_ids, type=pa.string()),
+        'flight_path': pa.ListArray.from_arrays(pa.array(offsets, type=pa.int32()), points),
+    }), path_file)
+
+
+# The sidecar is stale once the summaries it was written from have been regenerated
+def sidecar_is_fresh(path_file):
+    if not os.path.exists(path_file):
+        return False
+    return not os.path.exists(SUMMARIES_FILE) or os.path.getmtime(path_file) >= os.path.getmtime(SUMMARIES_FILE)
+
+
+# Paths are kept as two parallel float32 arrays per flight, 'lats' and 'lons'
+sidecar_lats, sidecar_lons = load_sidecar_paths(PATHS_FILE) if sidecar_is_fresh(PATHS_FILE) else ({}, {})
+if flights_df['fr24_id'].isin(list(sidecar_lats)).all():
+    flights_df['lats'] = flights_df['fr24_id'].map(sidecar_lats.get)
+    flights_df['lons'] = flights_df['fr24_id'].map(sidecar_lons.get)
+else:
+    print(f"{PATHS_FILE} is missing, stale or incomplete, parsing the flight_path column instead")
+    # Pull every [lat, lon] pair out of the flight_path column with one regex sweep, which also matches
+    # the (lat, lon) tuple syntax of files written before paths were stored as JSON
+    pairs = flights_df['flight_path'].str.extractall(r'[\[(]\s*([-+\d.eE]+)\s*,\s*([-+\d.eE]+)\s*[\])]')
+    # Convert all pairs to float32 in one go, then cut them back into per-flight arrays
+    # using the number of matches per row
+    coordinates = pairs.astype(np.float32).to_numpy()
+    pair_counts = pairs.groupby(level=0).size().reindex(flights_df.index, fill_value=0).to_numpy()
+    pair_offsets = np.concatenate([[0], np.cumsum(pair_counts)])
+    split_at = pair_offsets[1:-1]
+    flights_df['lats'] = pd.Series(np.split(np.ascontiguousarray(coordinates[:, 0]), split_at),
+                                   index=flights_df.index, dtype=object)
+    flights_df['lons'] = pd.Series(np.split(np.ascontiguousarray(coordinates[:, 1]), split_at),
+                                   index=flights_df.index, dtype=object)
+
+    # Refresh the sidecar so the next run can skip the parse
+    save_sidecar_paths(PATHS_FILE, flights_df['fr24_id'], coordinates, pair_offsets)
+    print(f"Flight paths saved to '{PATHS_FILE}'")
+
+# Count data points above 80° latitude for each flight with one pass over all paths:
+# the difference of a running total at the path boundaries gives the count per path
+path_lengths = flights_df['lats'].map(len).to_numpy(dtype=int)
+all_lats = np.concatenate(flights_df['lats'].tolist()) if len(flights_df) else np.empty(0, dtype=np.float32)
+all_lons = np.concatenate(flights_df['lons'].tolist()) if len(flights_df) else np.empty(0, dtype=np.float32)
+path_offsets = np.concatenate([[0], np.cumsum(path_lengths)])
+running_above_80 = np.concatenate([[0], np.cumsum(all_lats > 80)])
+flights_df['points_above_80'] = running_above_80[path_offsets[1:]] - running_above_80[path_offsets[:-1]]
 
 # Filter flights to only show those with at least 5 data points above 80° latitude
-high_arctic_flights = flights_df[flights_df['points_above_80'] >= 5]
+# and a drawable path of more than 3 points; this one mask selects every flight plotted below
+drawn = ((flights_df['points_above_80'] >= 5) & (path_lengths > 3)).to_numpy()
+high_arctic_flights = flights_df.loc[drawn]
 
 print(f"Total flights: {len(flights_df)}")
 print(f"Flights with 5+ points above 80°N: {len(high_arctic_flights)}")
@@ -106,9 +176,9 @@ destination_airports = set()
 polar_route_airports = set()  # All airports used in polar routes
 
 # Process each flight to identify airports in polar routes
-for _, flight in high_arctic_flights.iterrows():
-    origin_iata = flight.get('ori_iata', None)
-    dest_iata = flight.get('dest_iata', None)
+for flight in high_arctic_flights.itertuples(index=False):
+    origin_iata = getattr(flight, 'ori_iata', None)
+    dest_iata = getattr(flight, 'dest_iata', None)
 
     if origin_iata and not pd.isna(origin_iata):
         origin_airports.add(origin_iata)
@@ -123,12 +193,15 @@ print(f"Unique destination airports: {len(destination_airports)}")
 print(f"Total unique airports in polar routes: {len(polar_route_airports)}")
 
 
+# Vertices of a unit circle, computed once for every circular boundary
+_THETA = np.linspace(0, 2 * np.pi, 100)
+_UNIT_CIRCLE_VERTS = np.column_stack([np.sin(_THETA), np.cos(_THETA)])
+
+
 # Add circular polar boundary
 def add_circular_boundary(ax):
-    theta = np.linspace(0, 2 * np.pi, 100)
     center, radius = [0.5, 0.5], 0.75
-    verts = np.vstack([np.sin(theta), np.cos(theta)]).T
-    circle = mpath.Path(verts * radius + center)
+    circle = mpath.Path(_UNIT_CIRCLE_VERTS * radius + center)
     ax.set_boundary(circle, transform=ax.transAxes)
 
 
@@ -137,17 +210,17 @@ fig = plt.figure(figsize=(16, 12))  # Reduced size to stay under the 6000x6000 p
 
 # Create the main map axes that doesn't use the entire figure width
 ax = fig.add_axes([0.05, 0.05, 0.65, 0.9], projection=ccrs.NorthPolarStereo(central_longitude=0))
-ax.set_extent([-180, 180, 70, 90], ccrs.PlateCarree())
+ax.set_extent([-180, 180, 70, 90], PC)
 add_circular_boundary(ax)
 
 # Map features
-ax.add_feature(cfeature.COASTLINE.with_scale('110m'))
-ax.add_feature(cfeature.BORDERS.with_scale('110m'), linestyle=':')
-ax.add_feature(cfeature.LAND.with_scale('110m'), facecolor='lightgray', alpha=0.5)
-ax.add_feature(cfeature.OCEAN.with_scale('110m'), facecolor='lightblue', alpha=0.5)
+ax.add_feature(COASTLINE)
+ax.add_feature(BORDERS, linestyle=':')
+ax.add_feature(LAND, facecolor='lightgray', alpha=0.5)
+ax.add_feature(OCEAN, facecolor='lightblue', alpha=0.5)
 
 # Add meridians (longitude lines) and parallels (latitude circles)
-gl = ax.gridlines(crs=ccrs.PlateCarree(),
+gl = ax.gridlines(crs=PC,
                   draw_labels=False,
                   linewidth=1,
                   color='gray',
@@ -160,65 +233,88 @@ gl.ylocator = plt.FixedLocator([70, 75, 80, 85])  # parallels
 
 # Add latitude markers
 for lat in [65, 70, 75, 80, 85]:
-    ax.text(180, lat, f'{lat}°N', transform=ccrs.PlateCarree(),
+    ax.text(180, lat, f'{lat}°N', transform=PC,
             ha='center', va='center')
     circle = plt.Circle((0, 0), radius=90 - lat,
-                        transform=ccrs.PlateCarree(),
+                        transform=PC,
                         fill=False, linestyle='--', color='gray', alpha=0.5)
     ax.add_patch(circle)
 
-# Airline color mapping
-airlines = {}
-flight_origin_dest = {}  # Store origin and destination for each flight
-
-# Process each flight to get origin/destination airports
-for _, flight in high_arctic_flights.iterrows():
-    callsign = flight['callsign']
-    path = flight['parsed_path']
-
-    if len(path) > 3:
-        if callsign and len(callsign) >= 3:
-            airline_code = callsign[:3]
-            if airline_code not in airlines:
-                airlines[airline_code] = len(airlines)
-
-            # Get origin and destination IATA codes
-            origin_iata = flight.get('ori_iata', None)
-            dest_iata = flight.get('dest_iata', None)
-
-            # Format the airport names
-            origin_name = format_airport_name(origin_iata)
-            dest_name = format_airport_name(dest_iata)
-
-            # Store the origin and destination info
-            flight_origin_dest[callsign] = (origin_iata, origin_name, dest_iata, dest_name)
-
+# Airline color mapping, in order of first appearance
+callsigns = high_arctic_flights['callsign']
+airline_codes = callsigns.str.slice(0, 3).where(callsigns.str.len() >= 3)
+airline_codes = pd.Categorical(airline_codes, categories=airline_codes.dropna().unique())
+airlines = {code: idx for idx, code in enumerate(airline_codes.categories)}
 cmap = plt.cm.tab20
 colors = [cmap(i % 20) for i in range(len(airlines))]
 
-# Plot flights
-for _, flight in high_arctic_flights.iterrows():
-    path = flight['parsed_path']
-    if len(path) > 3:
-        lats, lons = zip(*path)
-        callsign = flight['callsign']
-        if callsign and len(callsign) >= 3:
-            airline_code = callsign[:3]
-            color = colors[airlines[airline_code]]
-        else:
-            color = 'gray'
-        line_width = min(max(flight['position_count'] / 2, 1), 4)
-
-        ax.plot(lons, lats, transform=ccrs.PlateCarree(),
-                linewidth=line_width, alpha=0.7, color=color)
-
-        # Entry/exit points and labels
-        ax.plot(lons[0], lats[0], 'go', markersize=4, transform=ccrs.PlateCarree())
-        ax.plot(lons[-1], lats[-1], 'ro', markersize=4, transform=ccrs.PlateCarree())
-        ax.text(lons[0], lats[0], callsign, transform=ccrs.PlateCarree(),
-                fontsize=6, color='green', ha='right', va='bottom', alpha=0.8)
-        ax.text(lons[-1], lats[-1], callsign, transform=ccrs.PlateCarree(),
-                fontsize=6, color='red', ha='left', va='top', alpha=0.8)
+# Flights without an airline have code -1, which picks the trailing gray entry
+palette = np.array(colors + [to_rgba('gray')])
+high_arctic_flights = high_arctic_flights.assign(
+    airline_code=airline_codes,
+    color_idx=airline_codes.codes,
+    line_width=np.clip(high_arctic_flights['position_count'].to_numpy() / 2.0, 1.0, 4.0),
+)
+
+# Flights drawn in an airline color, one row per callsign, and how many of them each airline has
+routed_flights = high_arctic_flights.loc[high_arctic_flights['airline_code'].notna()]
+routed_flights = routed_flights.drop_duplicates('callsign', keep='last')
+flights_per_airline = routed_flights['airline_code'].value_counts()
+
+# Colors and widths of the drawn flights, in the same order as their projected paths
+segment_colors = palette[high_arctic_flights['color_idx'].to_numpy()]
+segment_widths = high_arctic_flights['line_width'].to_numpy()
+
+# Project the vertices of every drawn flight in one batched call instead of once per artist,
+# picking them straight out of the flat arrays used for the 80° count
+to_map = Transformer.from_crs('EPSG:4326', ax.projection, always_xy=True)
+point_mask = np.repeat(drawn, path_lengths)
+map_x, map_y = to_map.transform(all_lons[point_mask], all_lats[point_mask])
+projected_segments = np.split(np.column_stack([map_x, map_y]), np.cumsum(path_lengths[drawn])[:-1])
+
+# Entry/exit points are the first and last vertex of each drawn path
+entry_points = path_offsets[:-1][drawn]
+exit_points = path_offsets[1:][drawn] - 1
+entry_lons, entry_lats = all_lons[entry_points], all_lats[entry_points]
+exit_lons, exit_lats = all_lons[exit_points], all_lats[exit_points]
+drawn_callsigns = high_arctic_flights['callsign'].to_numpy()
+
+
+# Project the entry/exit points once; labels and markers are then placed in map coordinates
+entry_x, entry_y = to_map.transform(entry_lons, entry_lats)
+exit_x, exit_y = to_map.transform(exit_lons, exit_lats)
+
+
+# Indices of the projected points worth labelling: only the first point in each cell of a LABEL_GRID x LABEL_GRID
+# grid over the map extent, since labels piled on top of each other are unreadable. Every endpoint lies north of
+# the 75°N query bounds and therefore on the map, so no points are dropped for being off the map
+LABEL_GRID = 80
+
+
+def label_positions(x, y):
+    x0, x1, y0, y1 = ax.get_extent()
+    cell_size = max(x1 - x0, y1 - y0) / LABEL_GRID
+    cells = np.floor(np.column_stack([x - x0, y - y0]) / cell_size).astype(np.int64)
+    _, first_in_cell = np.unique(cells, axis=0, return_index=True)
+    return np.sort(first_in_cell)
+
+
+# Label the entry/exit points without stacking labels
+entry_labels = label_positions(entry_x, entry_y)
+for x, y, callsign in zip(entry_x[entry_labels], entry_y[entry_labels], drawn_callsigns[entry_labels]):
+    ax.text(x, y, callsign, fontsize=6, color='green', ha='right', va='bottom', alpha=0.8)
+exit_labels = label_positions(exit_x, exit_y)
+for x, y, callsign in zip(exit_x[exit_labels], exit_y[exit_labels], drawn_callsigns[exit_labels]):
+    ax.text(x, y, callsign, fontsize=6, color='red', ha='left', va='top', alpha=0.8)
+
+# Plot all flights with one artist instead of one line per flight
+flight_lines = LineCollection(projected_segments, colors=segment_colors, linewidths=segment_widths,
+                              alpha=0.7, transform=ax.transData, zorder=2)
+# The dense flight layer is flattened to a single image; axes, labels and markers stay vector
+flight_lines.set_rasterized(True)
+ax.add_collection(flight_lines)
+ax.scatter(entry_x, entry_y, c='green', s=16, zorder=3)
+ax.scatter(exit_x, exit_y, c='red', s=16, zorder=3)
 
 # Add title
 plt.suptitle('High Arctic Flight Paths (80°N+, May 11–18, 2025) 1.4', fontsize=40, y=1.3)
@@ -227,32 +323,20 @@ plt.suptitle('High Arctic Flight Paths (80°N+, May 11–18, 2025) 1.4', fontsiz
 from matplotlib.lines import Line2D
 
 # Format origin/destination information
-# legend_elements = []
-# for airline, idx in sorted(airlines.items()):
-#     # Find flights for this airline
-#     airline_flights = []
-#     for callsign, (origin_iata, origin_name, dest_iata, dest_name) in flight_origin_dest.items():
-#         if callsign[:3] == airline:
-#             # Highlight polar route airports in blue
-#             if origin_iata and not pd.isna(origin_iata):
-#                 origin_display = f"\033[94m{origin_name}\033[0m" if origin_iata in polar_route_airports else origin_name
-#             else:
-#                 origin_display = "Unknown"
+# # The code columns are categorical, turn them back into plain strings before concatenating
+# routed_flights = routed_flights.assign(
+#     label=routed_flights['callsign'].astype(str) + ': '
+#           + routed_flights['ori_iata'].astype(object).map(format_airport_name)
+#           + ' → ' + routed_flights['dest_iata'].astype(object).map(format_airport_name))
 #
-#             if dest_iata and not pd.isna(dest_iata):
-#                 dest_display = f"\033[94m{dest_name}\033[0m" if dest_iata in polar_route_airports else dest_name
-#             else:
-#                 dest_display = "Unknown"
-#
-#             airline_flights.append(f"{callsign}: {origin_display} → {dest_display}")
-#
-#     # Add to legend with flight info
-#     flight_info = "\n".join(sorted(airline_flights)[:5])  # Sort and limit to first 5 flights if too many
-#     if len(airline_flights) > 5:
-#         flight_info += f"\n+ {len(airline_flights) - 5} more flights"
+# # Sort and limit to first 5 flights per airline if too many
+# flight_info = routed_flights.sort_values('label').groupby('airline_code')['label'].apply(
+#     lambda labels: '\n'.join(labels.head(5)) + (f"\n+ {len(labels) - 5} more flights" if len(labels) > 5 else ''))
 #
+# legend_elements = []
+# for airline, idx in sorted(airlines.items()):
 #     legend_elements.append(Line2D([0], [0], color=colors[idx], lw=2,
-#                                   label=f"{airline} ({len(airline_flights)} flights)\n{flight_info}"))
+#                                   label=f"{airline} ({flights_per_airline[airline]} flights)\n{flight_info[airline]}"))
 #
 # # Create a dedicated legend axis on the right side of the figure
 # legend_ax = fig.add_axes([0.75, 0.05, 0.2, 0.9])
@@ -274,21 +358,21 @@ ax.text(0.05, -0.05, 'Green dots: Entry points', fontsize=10, color='green', tra
 ax.text(0.35, -0.05, 'Red dots: Exit points', fontsize=10, color='red', transform=ax.transAxes)
 ax.text(0.65, -0.05, 'Only showing flights with 5+ data points above 80°N', fontsize=10, transform=ax.transAxes)
 
-# Major northern airports with coordinates and labels - using our default list for basic mapping
+# Major northern airports by IATA code with labels and coordinates - using our default list for basic mapping
 default_airports = {
-    'Oslo (OSL)': (60.1976, 11.1004),
-    'Saint Petersburg (LED)': (59.8003, 30.2625),
-    'Reykjavík (KEF)': (63.9850, -22.6056),
-    'Anchorage (ANC)': (61.1743, -149.9983),
-    'Murmansk (MMK)': (68.7817, 32.7508),
-    'Tromsø (TOS)': (69.6833, 18.9189),
-    'Magadan (GDX)': (59.9100, 150.7200),
-    'Yellowknife (YZF)': (62.4628, -114.4403),
-    'Inuvik (YEV)': (68.3042, -133.4833),
-    'Iqaluit (YFB)': (63.7564, -68.5558),
-    'Resolute Bay (YRB)': (74.7169, -94.9694),
-    'Longyearbyen (LYR)': (78.2461, 15.4656),
-    'Petropavlovsk-Kamchatsky (PKC)': (53.1709, 158.4536),
+    'OSL': ('Oslo (OSL)', 60.1976, 11.1004),
+    'LED': ('Saint Petersburg (LED)', 59.8003, 30.2625),
+    'KEF': ('Reykjavík (KEF)', 63.9850, -22.6056),
+    'ANC': ('Anchorage (ANC)', 61.1743, -149.9983),
+    'MMK': ('Murmansk (MMK)', 68.7817, 32.7508),
+    'TOS': ('Tromsø (TOS)', 69.6833, 18.9189),
+    'GDX': ('Magadan (GDX)', 59.9100, 150.7200),
+    'YZF': ('Yellowknife (YZF)', 62.4628, -114.4403),
+    'YEV': ('Inuvik (YEV)', 68.3042, -133.4833),
+    'YFB': ('Iqaluit (YFB)', 63.7564, -68.5558),
+    'YRB': ('Resolute Bay (YRB)', 74.7169, -94.9694),
+    'LYR': ('Longyearbyen (LYR)', 78.2461, 15.4656),
+    'PKC': ('Petropavlovsk-Kamchatsky (PKC)', 53.1709, 158.4536),
 }
 
 # Add airports from polar routes to our display
@@ -296,8 +380,7 @@ polar_route_airport_info = {}
 for iata in polar_route_airports:
     coords = get_airport_coordinates(iata)
     if coords:
-        name = format_airport_name(iata)
-        polar_route_airport_info[name] = coords
+        polar_route_airport_info[iata] = (format_airport_name(iata), *coords)
 
 # Combine default airports with polar route airports
 all_airports = {}
@@ -307,22 +390,28 @@ all_airports.update(polar_route_airport_info)
 # Display all airports
 min_lat = 60  # Map cutoff
 
-for name, (lat, lon) in all_airports.items():
-    is_polar_route = any(iata in name for iata in polar_route_airports)
-    airport_color = 'blue' if is_polar_route else 'gray'
-    marker_size = 8 if is_polar_route else 6
-    zorder = 10 if is_polar_route else 5
+# Airports south of the cutoff are pinned to it; project markers and label anchors in one call each
+airport_names = [name for name, _, _ in all_airports.values()]
+airport_lats, airport_lons = np.array([(lat, lon) for _, lat, lon in all_airports.values()], dtype=float).reshape(-1, 2).T
+on_map = airport_lats >= min_lat
+marker_x, marker_y = to_map.transform(airport_lons, np.maximum(airport_lats, min_lat))
+label_x, label_y = to_map.transform(airport_lons, np.where(on_map, airport_lats + 1, min_lat))
 
-    if lat >= min_lat:
+is_polar = np.array([iata in polar_route_airports for iata in all_airports], dtype=bool)
+
+# All airport markers in two scatter calls, polar route airports larger and on top
+ax.scatter(marker_x[is_polar], marker_y[is_polar], marker='^', c='blue', s=8 ** 2, zorder=10)
+ax.scatter(marker_x[~is_polar], marker_y[~is_polar], marker='^', c='gray', s=6 ** 2, zorder=5)
+
+for i, name in enumerate(airport_names):
+    lon = airport_lons[i]
+    airport_color = 'blue' if is_polar[i] else 'gray'
+
+    if on_map[i]:
         # Plot normally
-        ax.plot(lon, lat, marker='^', color=airport_color, markersize=marker_size,
-                transform=ccrs.PlateCarree(), zorder=zorder)
-        ax.text(lon, lat + 1, name, transform=ccrs.PlateCarree(),
+        ax.text(label_x[i], label_y[i], name,
                 fontsize=12, color=airport_color, ha='center', va='bottom')
     else:
-        ax.plot(lon, min_lat, marker='^', color=airport_color, markersize=marker_size,
-                transform=ccrs.PlateCarree(), zorder=zorder)
-
         # Determine flip and alignment
         if -180 < lon < 0:
             rotation = lon + 90
@@ -331,23 +420,20 @@ for name, (lat, lon) in all_airports.items():
             rotation = lon - 90
             ha = 'left'
 
-        ax.text(lon, 60, f"{name}",
+        ax.text(label_x[i], label_y[i], f"{name}",
                 fontsize=12, color=airport_color,
                 rotation=rotation,
                 rotation_mode='anchor',
                 ha=ha,
-                va='center',
-                transform=ccrs.PlateCarree(), )
+                va='center')
 
 # Create airline legend elements first
 airline_legend_elements = []
 for airline, idx in sorted(airlines.items()):
-    # Count flights for this airline
-    flight_count = sum(1 for callsign in flight_origin_dest if callsign[:3] == airline)
     # Add to legend with just the airline code and count
     airline_legend_elements.append(
         Line2D([0], [0], color=colors[idx], lw=4,
-              label=f"{airline} ({flight_count})")
+              label=f"{airline} ({flights_per_airline.get(airline, 0)})")
     )
 
 # Add airline legend at the bottom of the map
@@ -379,7 +465,7 @@ ax.add_artist(airport_legend)  # Keep this legend on the map
 figure_size_inches = fig.get_size_inches()
 max_dimension_inches = max(figure_size_inches)
 max_dpi = int(6000 / max_dimension_inches)
-output_dpi = min(300, max_dpi)  # Use 300 dpi or lower if needed to stay under limit
+output_dpi = min(300 if args.hires else 150, max_dpi)  # Use 150 dpi (300 with --hires) or lower if needed to stay under limit
 
 print(f"Saving image with dimensions: {figure_size_inches[0]*output_dpi} x {figure_size_inches[1]*output_dpi} pixels at {output_dpi} dpi")
 plt.savefig('high_arctic_flights_map.png', dpi=output_dpi, bbox_inches='tight')